@@ -9,43 +9,198 @@ Endpoints:
 - GET  /status        -> get player status
 
 Run: python dungeon_rpg_api.py
-Requires: Flask (pip install flask)
+Requires: Flask, orjson, NumPy, waitress (pip install flask orjson numpy waitress)
 
 This is a demo-level implementation intended for local testing and extension.
 """
 
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, stream_with_context
+import queue
 import sqlite3
+import threading
+import time
 import uuid
-import json
-import random
+import itertools
+import math
+import numpy as np
+import orjson
+from collections import OrderedDict
 from datetime import datetime
 from flask import send_from_directory
 
+try:
+    import numba
+except ImportError:  # optional: generate_dungeon falls back to the vectorized NumPy path
+    numba = None
+
 DB_PATH = 'dungeon.db'
+DB_POOL_SIZE = 8
+WRITE_BATCH_SIZE = 64
+WRITE_TIMEOUT = 30.0
+LEADERBOARD_TTL = 1.0
+STATUS_CACHE_SIZE = 1024
 
 app = Flask(__name__)
 
+
+def json_response(obj, status=200):
+    # orjson encodes straight to bytes, skipping jsonify's pure-Python encoder on hot endpoints
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+
 # ---------------------- Database helpers ----------------------
 
+# LIFO so the most recently used connection, with the warmest page cache, is handed out first
+_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_pool_lock = threading.Lock()
+_pool_opened = 0
+_write_queue = queue.Queue()
+_writer_lock = threading.Lock()
+_writer = None
+
+
+def connect_db():
+    # Autocommit mode: each statement is its own transaction unless wrapped in BEGIN/COMMIT
+    db = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False, timeout=5.0)
+    db.row_factory = sqlite3.Row
+    # These pragmas are per-connection; journal_mode=WAL is persisted in the file by init_db
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.execute('PRAGMA temp_store=MEMORY')
+    db.execute('PRAGMA mmap_size=268435456')
+    db.execute('PRAGMA cache_size=-20000')
+    return db
+
+
+def acquire_db():
+    # Hand out an idle pooled connection, opening new ones until the pool is full
+    global _pool_opened
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+    with _pool_lock:
+        if _pool_opened < DB_POOL_SIZE:
+            _pool_opened += 1
+            return connect_db()
+    return _pool.get()
+
+
+def release_db(db):
+    if db.in_transaction:
+        db.rollback()
+    _pool.put(db)
+
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DB_PATH)
-        db.row_factory = sqlite3.Row
+        db = g._database = acquire_db()
     return db
 
 
 @app.teardown_appcontext
 def close_connection(exception):
-    db = getattr(g, '_database', None)
+    db = g.pop('_database', None)
     if db is not None:
-        db.close()
+        release_db(db)
+
+
+def writer_loop():
+    # Single writer: every queued job that is waiting gets committed in one transaction
+    db = None
+    while True:
+        batch = [_write_queue.get()]
+        # Take whatever piled up during the previous commit; no artificial delay
+        while len(batch) < WRITE_BATCH_SIZE:
+            try:
+                batch.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            if db is None:
+                db = connect_db()
+            try:
+                db.execute('BEGIN IMMEDIATE')
+                for job in batch:
+                    # A savepoint per job keeps one failing request from undoing the rest of the batch
+                    db.execute('SAVEPOINT job')
+                    try:
+                        for sql, params in job['statements']:
+                            job['rows'] = db.execute(sql, params).fetchall()
+                    except Exception as exc:
+                        db.execute('ROLLBACK TO job')
+                        job['error'] = exc
+                    db.execute('RELEASE job')
+                db.execute('COMMIT')
+            except Exception:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                raise
+        except Exception as exc:
+            for job in batch:
+                job['error'] = job['error'] or exc
+            # The connection may be unusable now (or was never opened): start fresh on the next batch
+            if db is not None:
+                try:
+                    db.close()
+                except Exception:
+                    pass
+                db = None
+        finally:
+            # Every dequeued job is answered, whatever happened above
+            for job in batch:
+                job['done'].set()
+
+
+def write_db(*statements):
+    # Queue (sql, params) pairs for the writer and wait until the batch holding them is committed,
+    # so a read issued right after this returns already sees the change
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        with _writer_lock:
+            if _writer is None or not _writer.is_alive():
+                _writer = threading.Thread(target=writer_loop, name='db-writer', daemon=True)
+                _writer.start()
+    job = {'statements': statements, 'rows': [], 'error': None, 'done': threading.Event()}
+    _write_queue.put(job)
+    # Bounded wait, so a stuck writer surfaces as a 500 instead of pinning the request thread
+    if not job['done'].wait(WRITE_TIMEOUT):
+        raise RuntimeError('database writer did not answer within %.0f seconds' % WRITE_TIMEOUT)
+    if job['error'] is not None:
+        raise job['error']
+    return job['rows']
+
+
+def backfill_legacy_players(db):
+    # Rows written before the split only have the dungeon JSON: recover size and explored rooms from it.
+    # No dungeons row is created for them, since the old per-cell grid does not map onto the packed
+    # arrays and nothing reads the layout after /start_game.
+    rows = db.execute('SELECT id, dungeon FROM players WHERE dungeon_size IS NULL AND dungeon IS NOT NULL').fetchall()
+    if not rows:
+        return
+    db.execute('BEGIN')
+    try:
+        for row in rows:
+            dungeon = orjson.loads(row['dungeon'])
+            size = dungeon['size']
+            visited = 0
+            for y, cells in enumerate(dungeon['grid']):
+                for x, cell in enumerate(cells):
+                    if cell.get('visited'):
+                        visited |= 1 << (y * size + x)
+            db.execute('UPDATE players SET dungeon_size = ?, visited = ? WHERE id = ?',
+                       (size, pack_visited(visited | 1), row['id']))
+    except Exception:
+        db.execute('ROLLBACK')
+        raise
+    db.execute('COMMIT')
 
 
 def init_db():
     db = get_db()
     cur = db.cursor()
+    # WAL lets readers run alongside a writer and avoids a full fsync per commit
+    cur.execute('PRAGMA journal_mode=WAL')
     cur.execute('''
         CREATE TABLE IF NOT EXISTS players (
             id TEXT PRIMARY KEY,
@@ -57,18 +212,73 @@ def init_db():
             inventory TEXT,
             x INTEGER,
             y INTEGER,
-            dungeon TEXT,
+            dungeon_size INTEGER,
+            visited BLOB,
             in_battle INTEGER DEFAULT 0,
             monster TEXT,
             created_at TEXT
         )
     ''')
-    db.commit()
+    # Older databases kept the whole dungeon JSON on the player row; add the split columns in place
+    columns = {row['name'] for row in cur.execute('PRAGMA table_info(players)')}
+    for column, decl in (('dungeon_size', 'INTEGER'), ('visited', 'BLOB')):
+        if column not in columns:
+            cur.execute(f'ALTER TABLE players ADD COLUMN {column} {decl}')
+    if 'dungeon' in columns:
+        backfill_legacy_players(db)
+    # Covers the leaderboard query, so ORDER BY ... LIMIT 10 reads 10 index entries with no sort
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_players_rank ON players(level DESC, exp DESC, name)')
+    # The dungeon layout never changes after creation, so it is written once and kept apart
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS dungeons (
+            player_id TEXT PRIMARY KEY,
+            grid BLOB
+        )
+    ''')
+
+
+# ---------------------- Response caches ----------------------
+# Finished JSON bodies kept in process memory; only valid while a single server process owns the database
+
+_leaderboard_cache = None  # (body, time.monotonic() when built)
+_status_cache = OrderedDict()  # player_id -> {include variant: /status body}, least recently used first
+_status_cache_lock = threading.Lock()
+# Bumped on every invalidation, so a body built from a read that raced a write is not cached
+_status_epoch = 0
+
+
+def cached_status(pid, variant):
+    with _status_cache_lock:
+        variants = _status_cache.get(pid)
+        if variants is None:
+            return None, _status_epoch
+        _status_cache.move_to_end(pid)
+        return variants.get(variant), _status_epoch
+
+
+def cache_status(pid, variant, body, epoch):
+    with _status_cache_lock:
+        if epoch != _status_epoch:
+            return
+        _status_cache.setdefault(pid, {})[variant] = body
+        _status_cache.move_to_end(pid)
+        if len(_status_cache) > STATUS_CACHE_SIZE:
+            _status_cache.popitem(last=False)
+
+
+def invalidate_status(pid):
+    global _status_epoch
+    with _status_cache_lock:
+        _status_epoch += 1
+        _status_cache.pop(pid, None)
 
 
 # ---------------------- Game logic ----------------------
 
 ROOM_TYPES = ['empty', 'monster', 'treasure', 'trap']
+# Bias towards emptier rooms
+ROOM_WEIGHTS = [0.50, 0.30, 0.12, 0.08]
+ROOM_CDF = np.cumsum(ROOM_WEIGHTS)
 MONSTER_BASE = [
     {"name": "Goblin", "hp": 6, "atk": 2, "exp": 5},
     {"name": "Skeleton", "hp": 8, "atk": 3, "exp": 8},
@@ -76,58 +286,162 @@ MONSTER_BASE = [
 ]
 TREASURE_ITEMS = ["gold_coin", "healing_potion", "rusty_sword", "gem"]
 
+MONSTER_STATS = np.array([[m['hp'], m['atk'], m['exp']] for m in MONSTER_BASE], dtype=np.int16)
+# Struct-of-arrays dungeon layout: one size x size array per field, zero where the field does not apply.
+# This is also the order the arrays are packed into dungeons.grid.
+DUNGEON_FIELDS = (
+    ('types', np.uint8),            # index into ROOM_TYPES
+    ('monster', np.uint8),          # index into MONSTER_BASE
+    ('monster_hp', np.int16),
+    ('monster_atk', np.int16),
+    ('monster_exp', np.int16),
+    ('treasure_item', np.uint8),    # index into TREASURE_ITEMS
+    ('treasure_amount', np.uint8),
+    ('trap_dmg', np.uint8),
+)
 
-def generate_dungeon(size=5):
-    # Create a size x size dungeon where each cell has a room type and seed
-    grid = []
+# Shared PCG64 generator for all game randomness
+_rng = np.random.default_rng()
+
+
+def roll_int(low, high):
+    # Inclusive on both ends, like random.randint
+    return int(_rng.integers(low, high + 1))
+
+
+def _fill_grid_np(size):
+    shape = (size, size)
+    types = _rng.choice(len(ROOM_TYPES), size=shape, p=ROOM_WEIGHTS).astype(np.uint8)
+    # Guarantee start cell is empty
+    types[0, 0] = ROOM_TYPES.index('empty')
+    is_monster = types == ROOM_TYPES.index('monster')
+    is_treasure = types == ROOM_TYPES.index('treasure')
+    is_trap = types == ROOM_TYPES.index('trap')
+
+    # pick a monster template per room, scaled by a random factor so later rooms can be harder
+    monster = _rng.integers(len(MONSTER_BASE), size=shape, dtype=np.uint8) * is_monster
+    multiplier = _rng.choice(np.array([1, 1, 1, 2], dtype=np.int16), size=shape) * is_monster
+    stats = MONSTER_STATS[monster] * multiplier[..., None]
+
+    return (
+        types, monster, stats[..., 0], stats[..., 1], stats[..., 2],
+        _rng.integers(len(TREASURE_ITEMS), size=shape, dtype=np.uint8) * is_treasure,
+        _rng.integers(1, 6, size=shape, dtype=np.uint8) * is_treasure,
+        _rng.integers(1, 7, size=shape, dtype=np.uint8) * is_trap,
+    )
+
+
+def _fill_grid_loop(size, seed, room_cdf, monster_stats, n_items):
+    # Same distribution as _fill_grid_np, written as one pass over the cells for numba to compile
+    np.random.seed(seed)
+    types = np.zeros((size, size), np.uint8)
+    monster = np.zeros((size, size), np.uint8)
+    hp = np.zeros((size, size), np.int16)
+    atk = np.zeros((size, size), np.int16)
+    exp = np.zeros((size, size), np.int16)
+    item = np.zeros((size, size), np.uint8)
+    amount = np.zeros((size, size), np.uint8)
+    trap = np.zeros((size, size), np.uint8)
     for y in range(size):
-        row = []
         for x in range(size):
-            # Bias towards emptier rooms
-            choice = random.choices(ROOM_TYPES, weights=[50, 30, 12, 8])[0]
-            cell = {"type": choice, "visited": False}
-            if choice == 'monster':
-                # pick a monster template and attach a scaled variant
-                template = random.choice(MONSTER_BASE)
-                # scale by random factor so later rooms can be harder
-                multiplier = random.choice([1, 1, 1, 2])
-                cell['monster'] = {
-                    "name": template['name'],
-                    "hp": template['hp'] * multiplier,
-                    "atk": template['atk'] * multiplier,
-                    "exp": template['exp'] * multiplier
-                }
-            elif choice == 'treasure':
-                cell['treasure'] = {
-                    'item': random.choice(TREASURE_ITEMS),
-                    'amount': random.randint(1, 5)
-                }
-            elif choice == 'trap':
-                cell['trap'] = {
-                    'damage': random.randint(1, 6)
-                }
-            row.append(cell)
-        grid.append(row)
-    # Guarantee start cell is empty
-    grid[0][0] = {"type": "empty", "visited": True}
-    return {
-        "size": size,
-        "grid": grid
-    }
+            # start cell stays empty
+            if x == 0 and y == 0:
+                continue
+            roll = np.random.random()
+            if roll < room_cdf[0]:
+                continue
+            # room type codes follow ROOM_TYPES
+            if roll < room_cdf[1]:
+                types[y, x] = 1
+                t = np.random.randint(0, monster_stats.shape[0])
+                multiplier = 2 if np.random.random() < 0.25 else 1
+                monster[y, x] = t
+                hp[y, x] = monster_stats[t, 0] * multiplier
+                atk[y, x] = monster_stats[t, 1] * multiplier
+                exp[y, x] = monster_stats[t, 2] * multiplier
+            elif roll < room_cdf[2]:
+                types[y, x] = 2
+                item[y, x] = np.random.randint(0, n_items)
+                amount[y, x] = np.random.randint(1, 6)
+            else:
+                types[y, x] = 3
+                trap[y, x] = np.random.randint(1, 7)
+    return types, monster, hp, atk, exp, item, amount, trap
+
+
+_fill_grid_nb = numba.njit(cache=True)(_fill_grid_loop) if numba is not None else None
+
+
+def generate_dungeon(size=5):
+    # Create a size x size dungeon where each cell has a room type and its contents
+    if _fill_grid_nb is not None:
+        fields = _fill_grid_nb(size, int(_rng.integers(2 ** 32)), ROOM_CDF, MONSTER_STATS, len(TREASURE_ITEMS))
+    else:
+        fields = _fill_grid_np(size)
+    dungeon = {name: field for (name, _), field in zip(DUNGEON_FIELDS, fields)}
+    dungeon['size'] = size
+    return dungeon
+
+
+# Most games use the default 4-6 sizes, so a few layouts per size are generated once at import and
+# each new game gets a copy of one with re-rolled monster strength instead of a fresh generation
+DUNGEON_POOL_SIZES = (4, 5, 6)
+DUNGEON_POOL_DEPTH = 32
+_DUNGEON_POOL = {n: [generate_dungeon(n) for _ in range(DUNGEON_POOL_DEPTH)] for n in DUNGEON_POOL_SIZES}
+
+
+def new_dungeon(size=5):
+    templates = _DUNGEON_POOL.get(size)
+    if templates is None:
+        return generate_dungeon(size)
+    dungeon = {name: field.copy() for name, field in templates[_rng.integers(len(templates))].items() if name != 'size'}
+    dungeon['size'] = size
+    # scale each monster's hp and attack by up to +/-20% so games sharing a layout still play differently
+    is_monster = dungeon['types'] == ROOM_TYPES.index('monster')
+    scale = _rng.uniform(0.8, 1.2, size=(size, size))
+    for name in ('monster_hp', 'monster_atk'):
+        dungeon[name] = np.where(is_monster, np.maximum(1, np.rint(dungeon[name] * scale)), 0).astype(np.int16)
+    return dungeon
+
+
+def pack_dungeon(dungeon):
+    return sqlite3.Binary(b''.join(dungeon[name].astype(dtype, copy=False).tobytes() for name, dtype in DUNGEON_FIELDS))
+
+
+def pack_visited(visited):
+    # visited is an int bitmap: bit (y * size + x) is set once room (x, y) has been explored
+    return visited.to_bytes((visited.bit_length() + 7) // 8, 'little')
+
+
+def unpack_visited(blob):
+    return int.from_bytes(blob or b'', 'little')
+
+
+def create_player(player, dungeon):
+    write_db(
+        ('''
+            INSERT INTO players (id, name, health, max_health, level, exp, inventory, x, y, dungeon_size, visited, in_battle, monster, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            player['id'], player.get('name'), player['health'], player['max_health'], player['level'],
+            player.get('exp', 0), orjson.dumps(player.get('inventory', {})), player['x'], player['y'], player['dungeon_size'],
+            pack_visited(player['visited']), 1 if player.get('in_battle') else 0, None, player.get('created_at')
+        )),
+        ('INSERT INTO dungeons (player_id, grid) VALUES (?, ?)', (player['id'], pack_dungeon(dungeon))),
+    )
 
 
 def save_player(player):
-    db = get_db()
-    cur = db.cursor()
-    cur.execute('''
-        INSERT OR REPLACE INTO players (id, name, health, max_health, level, exp, inventory, x, y, dungeon, in_battle, monster, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    # Only the mutable columns are written; the dungeon row is left untouched
+    write_db(('''
+        UPDATE players SET health = ?, max_health = ?, level = ?, exp = ?, inventory = ?, x = ?, y = ?, visited = ?, in_battle = ?, monster = ?
+        WHERE id = ?
     ''', (
-        player['id'], player.get('name'), player['health'], player['max_health'], player['level'],
-        player.get('exp', 0), json.dumps(player.get('inventory', [])), player['x'], player['y'], json.dumps(player['dungeon']),
-        1 if player.get('in_battle') else 0, json.dumps(player.get('monster')) if player.get('monster') else None, player.get('created_at')
-    ))
-    db.commit()
+        player['health'], player['max_health'], player['level'], player.get('exp', 0), orjson.dumps(player.get('inventory', {})),
+        player['x'], player['y'], pack_visited(player['visited']), 1 if player.get('in_battle') else 0,
+        orjson.dumps(player.get('monster')) if player.get('monster') else None, player['id']
+    )))
+    invalidate_status(player['id'])
 
 
 def load_player(pid):
@@ -138,20 +452,33 @@ def load_player(pid):
     if not row:
         return None
     player = dict(row)
-    player['inventory'] = json.loads(player['inventory']) if player['inventory'] else []
-    player['dungeon'] = json.loads(player['dungeon']) if player['dungeon'] else None
+    inventory = orjson.loads(player['inventory']) if player['inventory'] else {}
+    if isinstance(inventory, list):
+        # older saves kept a list of single-item dicts: [{'healing_potion': 1}, {'gem': 2}]
+        merged = {}
+        for entry in inventory:
+            for name, count in entry.items():
+                merged[name] = merged.get(name, 0) + count
+        inventory = {name: count for name, count in merged.items() if count > 0}
+    player['inventory'] = inventory
+    player['visited'] = unpack_visited(player['visited'])
     player['in_battle'] = bool(player['in_battle'])
-    player['monster'] = json.loads(player['monster']) if player['monster'] else None
+    player['monster'] = orjson.loads(player['monster']) if player['monster'] else None
     return player
 
 
 def apply_level_up(player):
-    # simple levelling: every 20 exp -> +1 level
-    while player.get('exp', 0) >= player.get('level', 1) * 20:
-        player['exp'] -= player['level'] * 20
-        player['level'] += 1
-        player['max_health'] += 5
-        player['health'] = player['max_health']
+    # simple levelling: level L -> L+1 costs L*20 exp
+    level, exp = player.get('level', 1), player.get('exp', 0)
+    if exp < level * 20:
+        return
+    # n level-ups cost 20 * (n*L + n*(n-1)/2) = 10n^2 + 10(2L-1)n exp; take the largest n that fits
+    b = 10 * (2 * level - 1)
+    n = (math.isqrt(b * b + 40 * exp) - b) // 20
+    player['exp'] = exp - 20 * (n * level + n * (n - 1) // 2)
+    player['level'] = level + n
+    player['max_health'] += 5 * n
+    player['health'] = player['max_health']
 
 
 # ---------------------- Endpoints ----------------------
@@ -159,9 +486,10 @@ def apply_level_up(player):
 @app.route('/start_game', methods=['POST'])
 def start_game():
     data = request.get_json() or {}
-    name = data.get('name') or f'Adventurer_{random.randint(1000,9999)}'
-    size = data.get('dungeon_size', random.randint(4, 6))
+    name = data.get('name') or f'Adventurer_{roll_int(1000, 9999)}'
+    size = data.get('dungeon_size', roll_int(4, 6))
 
+    dungeon = new_dungeon(size=size)
     player = {
         'id': str(uuid.uuid4()),
         'name': name,
@@ -169,16 +497,17 @@ def start_game():
         'max_health': 20,
         'level': 1,
         'exp': 0,
-        'inventory': [],
+        'inventory': {},
         'x': 0,
         'y': 0,
-        'dungeon': generate_dungeon(size=size),
+        'dungeon_size': dungeon['size'],
+        'visited': 1,  # start cell
         'in_battle': False,
         'monster': None,
         'created_at': datetime.utcnow().isoformat()
     }
 
-    save_player(player)
+    create_player(player, dungeon)
     # Hide dungeon grid in response but give size and player id
     resp = {
         'player_id': player['id'],
@@ -186,93 +515,28 @@ def start_game():
         'level': player['level'],
         'health': player['health'],
         'position': {'x': player['x'], 'y': player['y']},
-        'dungeon_size': player['dungeon']['size']
+        'dungeon_size': player['dungeon_size']
     }
     return jsonify({'ok': True, 'player': resp}), 201
 
-@app.route('/fight', methods=['POST'])
-def fight():
-    data = request.get_json() or {}
-    pid = data.get('player_id')
-    action = (data.get('action') or 'attack').lower()
-    if not pid:
-        return jsonify({'ok': False, 'error': 'player_id required'}), 400
-
-    player = load_player(pid)
-    if not player:
-        return jsonify({'ok': False, 'error': 'player not found'}), 404
-
-    if not player.get('in_battle') or not player.get('monster'):
-        return jsonify({'ok': False, 'error': 'No monster to fight'}), 400
-
-    monster = player['monster']
-
-    if action == 'run':
-        # small chance to escape
-        if random.random() < 0.6:
-            player['in_battle'] = False
-            player['monster'] = None
-            save_player(player)
-            return jsonify({'ok': True, 'result': 'escaped', 'message': 'You escaped the fight.'})
-        else:
-            # failed escape -> monster hits once
-            m_atk = max(1, random.randint(1, monster.get('atk', 1)))
-            player['health'] -= m_atk
-            if player['health'] <= 0:
-                player['health'] = 0
-            save_player(player)
-            return jsonify({'ok': True, 'result': 'failed_escape', 'damage_taken': m_atk, 'health': player['health']})
-
-    # Player attack
-    p_atk = random.randint(1, 4) + (player.get('level', 1) - 1)
-    monster['hp'] -= p_atk
-
-    result = {'player_attack': p_atk}
-
-    if monster['hp'] <= 0:
-        # monster defeated
-        gained_exp = monster.get('exp', 5)
-        player['exp'] = player.get('exp', 0) + gained_exp
-        # small loot chance
-        loot = None
-        if random.random() < 0.5:
-            loot = random.choice(TREASURE_ITEMS)
-            player['inventory'].append({loot: 1})
-
-        player['in_battle'] = False
-        player['monster'] = None
-        apply_level_up(player)
-        save_player(player)
-        result.update({'monster_defeated': True, 'gained_exp': gained_exp, 'loot': loot, 'health': player['health'], 'level': player['level'], 'exp': player['exp']})
-        return jsonify({'ok': True, 'result': result})
-
-    # Monster attacks back
-    m_atk = random.randint(1, monster.get('atk', 1))
-    player['health'] -= m_atk
-    if player['health'] <= 0:
-        player['health'] = 0
-    player['monster'] = monster
-    save_player(player)
-
-    result.update({'monster_attack': m_atk, 'monster_hp': monster['hp'], 'player_health': player['health']})
-    return jsonify({'ok': True, 'result': result})
-
-
 @app.route('/status', methods=['GET'])
 def status():
     pid = request.args.get('player_id')
     if not pid:
-        return jsonify({'ok': False, 'error': 'player_id query param required'}), 400
+        return json_response({'ok': False, 'error': 'player_id query param required'}, 400)
+
+    # visited and monster are only serialized when asked for: ?include=visited,monster
+    include = request.args.get('include', '').split(',')
+    variant = ('visited' in include, 'monster' in include)
+    body, epoch = cached_status(pid, variant)
+    if body is not None:
+        return app.response_class(body, mimetype='application/json')
 
     player = load_player(pid)
     if not player:
-        return jsonify({'ok': False, 'error': 'player not found'}), 404
-
-    # Hide full dungeon grid but provide visited map and size
-    dungeon = player['dungeon']
-    size = dungeon['size']
-    visited = [[cell.get('visited', False) for cell in row] for row in dungeon['grid']]
+        return json_response({'ok': False, 'error': 'player not found'}, 404)
 
+    # Hide full dungeon grid but provide size
     resp = {
         'id': player['id'],
         'name': player['name'],
@@ -280,14 +544,19 @@ def status():
         'exp': player.get('exp', 0),
         'health': player['health'],
         'max_health': player['max_health'],
-        'inventory': player.get('inventory', []),
+        'inventory': player.get('inventory', {}),
         'position': {'x': player['x'], 'y': player['y']},
-        'dungeon_size': size,
-        'visited': visited,
+        'dungeon_size': player['dungeon_size'],
         'in_battle': player.get('in_battle', False),
-        'monster': player.get('monster') if player.get('in_battle') else None
     }
-    return jsonify({'ok': True, 'status': resp})
+    if variant[0]:
+        # bit (y * size + x) is set for explored rooms
+        resp['visited'] = format(player['visited'], 'x')
+    if variant[1]:
+        resp['monster'] = player.get('monster') if player.get('in_battle') else None
+    body = orjson.dumps({'ok': True, 'status': resp})
+    cache_status(pid, variant, body, epoch)
+    return app.response_class(body, mimetype='application/json')
 
 
 # ---------------------- Utility: dump all players (dev) ----------------------
@@ -296,8 +565,15 @@ def debug_players():
     db = get_db()
     cur = db.cursor()
     cur.execute('SELECT id, name, level, health, x, y, in_battle, created_at FROM players')
-    rows = cur.fetchall()
-    return jsonify([dict(r) for r in rows])
+
+    # Stream one row at a time instead of building the whole list in memory
+    def generate():
+        yield b'['
+        for i, row in enumerate(cur):
+            yield (b',' if i else b'') + orjson.dumps(dict(row))
+        yield b']'
+
+    return app.response_class(stream_with_context(generate()), mimetype='application/json')
 
 
 # ---------------------- Extra Gameplay Endpoints ----------------------
@@ -314,22 +590,17 @@ def use_item():
     if not player:
         return jsonify({'ok': False, 'error': 'player not found'}), 404
 
-    # find item in inventory
-    idx = None
-    for i, it in enumerate(player.get('inventory', [])):
-        if item in it and it[item] > 0:
-            idx = i
-            break
-    if idx is None:
+    inventory = player['inventory']
+    if inventory.get(item, 0) <= 0:
         return jsonify({'ok': False, 'error': 'item not in inventory'}), 400
 
     # healing potion logic
     if item == 'healing_potion':
-        heal = random.randint(4, 8)
+        heal = roll_int(4, 8)
         player['health'] = min(player['max_health'], player['health'] + heal)
-        player['inventory'][idx][item] -= 1
-        if player['inventory'][idx][item] <= 0:
-            player['inventory'].pop(idx)
+        inventory[item] -= 1
+        if inventory[item] <= 0:
+            del inventory[item]
         save_player(player)
         return jsonify({'ok': True, 'healed': heal, 'health': player['health']})
 
@@ -340,21 +611,22 @@ def use_item():
 def respawn():
     data = request.get_json() or {}
     pid = data.get('player_id')
-    player = load_player(pid)
-    if not player:
-        return jsonify({'ok': False, 'error': 'player not found'}), 404
-    if player['health'] > 0:
+
+    # respawn at start with penalty; the dead-check and the reset are one statement
+    rows = write_db(('''
+        UPDATE players SET health = max_health, x = 0, y = 0, exp = max(0, exp - 5), in_battle = 0, monster = NULL
+        WHERE id = ? AND health <= 0
+        RETURNING health, exp
+    ''', (pid,)))
+    if not rows:
+        # Only the failure path needs to tell a missing player from a living one
+        if get_db().execute('SELECT 1 FROM players WHERE id = ?', (pid,)).fetchone() is None:
+            return jsonify({'ok': False, 'error': 'player not found'}), 404
         return jsonify({'ok': False, 'error': 'player is not dead'}), 400
 
-    # respawn at start with penalty
-    player['health'] = player['max_health']
-    player['x'] = 0
-    player['y'] = 0
-    player['exp'] = max(0, player.get('exp', 0) - 5)
-    player['in_battle'] = False
-    player['monster'] = None
-    save_player(player)
-    return jsonify({'ok': True, 'message': 'Respawned at entrance', 'health': player['health'], 'exp': player['exp']})
+    invalidate_status(pid)
+    respawned = rows[0]
+    return jsonify({'ok': True, 'message': 'Respawned at entrance', 'health': respawned['health'], 'exp': respawned['exp']})
 
 
 @app.route('/map', methods=['GET'])
@@ -362,11 +634,10 @@ def ascii_map():
     pid = request.args.get('player_id')
     player = load_player(pid)
     if not player:
-        return jsonify({'ok': False, 'error': 'player not found'}), 404
+        return json_response({'ok': False, 'error': 'player not found'}, 404)
 
-    dungeon = player['dungeon']
-    size = dungeon['size']
-    grid = dungeon['grid']
+    size = player['dungeon_size']
+    visited = player['visited']
     lines = []
     for y in range(size):
         row = []
@@ -374,18 +645,22 @@ def ascii_map():
             if player['x'] == x and player['y'] == y:
                 row.append('P')
             else:
-                cell = grid[y][x]
-                row.append('.' if cell.get('visited') else '#')
+                row.append('.' if visited >> (y * size + x) & 1 else '#')
         lines.append(' '.join(row))
-    return jsonify({'ok': True, 'map': '\n'.join(lines)})
+    return json_response({'ok': True, 'map': '\n'.join(lines)})
 
 @app.route('/leaderboard', methods=['GET'])
 def leaderboard():
-    db = get_db()
-    cur = db.cursor()
-    cur.execute('SELECT name, level, exp FROM players ORDER BY level DESC, exp DESC LIMIT 10')
-    rows = [dict(r) for r in cur.fetchall()]
-    return jsonify({'ok': True, 'leaders': rows})
+    # Rankings only move on level-ups, so serve the same body for up to LEADERBOARD_TTL seconds
+    global _leaderboard_cache
+    now = time.monotonic()
+    if _leaderboard_cache is None or now - _leaderboard_cache[1] >= LEADERBOARD_TTL:
+        db = get_db()
+        cur = db.cursor()
+        cur.execute('SELECT name, level, exp FROM players ORDER BY level DESC, exp DESC LIMIT 10')
+        rows = [dict(r) for r in cur.fetchall()]
+        _leaderboard_cache = (orjson.dumps({'ok': True, 'leaders': rows}), now)
+    return app.response_class(_leaderboard_cache[0], mimetype='application/json')
 
 # ---------------------- Boss + Eventful Movement + Equipment ----------------------
 
@@ -396,16 +671,27 @@ DIRECTIONS = {
     'west': (-1, 0),
 }
 
+AMBIENCE = (
+    'You hear dripping water...',
+    'A distant growl echoes...',
+    'Dust falls from the ceiling...',
+    'You feel like you are being watched...'
+)
+
+
+# Index of the edge flag that blocks each direction in a (x == 0, y == 0, x == size-1, y == size-1) key
+_BLOCKING_EDGE = {'north': 1, 'south': 3, 'east': 2, 'west': 0}
+# Only the 16 edge states matter for movability, whatever the dungeon size
+_MOVES_TABLE = {
+    edges: tuple(name for name in DIRECTIONS if not edges[_BLOCKING_EDGE[name]])
+    for edges in itertools.product((False, True), repeat=4)
+}
+
 
 def available_moves(player):
-    size = player['dungeon']['size']
+    size = player['dungeon_size']
     x, y = player['x'], player['y']
-    moves = []
-    for name, (dx, dy) in DIRECTIONS.items():
-        nx, ny = x + dx, y + dy
-        if 0 <= nx < size and 0 <= ny < size:
-            moves.append(name)
-    return moves
+    return _MOVES_TABLE[x == 0, y == 0, x == size - 1, y == size - 1]
 
 
 @app.route('/move', methods=['POST'])
@@ -415,55 +701,51 @@ def move():
     direction = (data.get('direction') or '').lower()
 
     if direction not in DIRECTIONS:
-        return jsonify({'ok': False, 'error': 'invalid direction'}), 400
+        return json_response({'ok': False, 'error': 'invalid direction'}, 400)
 
     player = load_player(pid)
     if not player:
-        return jsonify({'ok': False, 'error': 'player not found'}), 404
+        return json_response({'ok': False, 'error': 'player not found'}, 404)
 
     dx, dy = DIRECTIONS[direction]
     nx, ny = player['x'] + dx, player['y'] + dy
-    size = player['dungeon']['size']
+    size = player['dungeon_size']
 
     if not (0 <= nx < size and 0 <= ny < size):
-        return jsonify({'ok': True, 'moved': False, 'event': 'A cold stone wall blocks your path.', 'available_moves': available_moves(player)})
+        return json_response({'ok': True, 'moved': False, 'event': 'A cold stone wall blocks your path.', 'available_moves': available_moves(player)})
 
     player['x'], player['y'] = nx, ny
-    player['dungeon']['grid'][ny][nx]['visited'] = True
+    player['visited'] |= 1 << (ny * size + nx)
 
     # Boss room (bottom-right corner)
     if nx == size-1 and ny == size-1 and player['level'] >= 5:
         player['in_battle'] = True
         player['monster'] = {'name': 'Dungeon Warden', 'hp': 35, 'attack': 6}
         save_player(player)
-        return jsonify({'ok': True, 'moved': True, 'event': 'The air trembles... The Dungeon Warden awakens!', 'available_moves': available_moves(player), 'boss': True})
+        return json_response({'ok': True, 'moved': True, 'event': 'The air trembles... The Dungeon Warden awakens!', 'available_moves': available_moves(player), 'boss': True})
 
-    # Normal ambient flavor
-    ambience = random.choice([
-        'You hear dripping water...',
-        'A distant growl echoes...',
-        'Dust falls from the ceiling...',
-        'You feel like you are being watched...'
-    ])
+    # Draw everything this move might need in one call: ambience line, goblin hp, trap damage
+    ambience, goblin_hp, dmg = (int(v) for v in _rng.integers((0, 6, 2), (len(AMBIENCE), 11, 6)))
 
     # Random encounters
-    roll = random.random()
+    roll = _rng.random()
     if roll < 0.35:
         player['in_battle'] = True
-        player['monster'] = {'name': 'Goblin', 'hp': random.randint(6, 10), 'attack': 3}
+        player['monster'] = {'name': 'Goblin', 'hp': goblin_hp, 'attack': 3}
         event = 'A Goblin jumps out!'
     elif roll < 0.55:
-        player.setdefault('inventory', []).append({'healing_potion': 1})
+        inventory = player['inventory']
+        inventory['healing_potion'] = inventory.get('healing_potion', 0) + 1
         event = 'You found a healing potion!'
     elif roll < 0.70:
-        dmg = random.randint(2, 5)
         player['health'] -= dmg
         event = f'A trap triggers! You take {dmg} damage.'
     else:
-        event = ambience
+        # Normal ambient flavor
+        event = AMBIENCE[ambience]
 
     save_player(player)
-    return jsonify({'ok': True, 'moved': True, 'event': event, 'available_moves': available_moves(player)})
+    return json_response({'ok': True, 'moved': True, 'event': event, 'available_moves': available_moves(player)})
 
 
 @app.route('/equip', methods=['POST'])
@@ -476,41 +758,39 @@ def equip():
     if not player:
         return jsonify({'ok': False, 'error': 'player not found'}), 404
 
-    for it in player.get('inventory', []):
-        if item in it and it[item] > 0:
-            player['equipped'] = item
-            save_player(player)
-            return jsonify({'ok': True, 'equipped': item})
+    if player['inventory'].get(item, 0) > 0:
+        player['equipped'] = item
+        save_player(player)
+        return jsonify({'ok': True, 'equipped': item})
 
     return jsonify({'ok': False, 'error': 'item not owned'}), 400
 
 
-# modify fight to use weapon bonus
-old_fight = fight
-
+@app.route('/fight', methods=['POST'])
 def fight():
     data = request.get_json() or {}
     pid = data.get('player_id')
     action = (data.get('action') or 'attack').lower()
 
+    if action == 'run':
+        # Running needs no game state, so leave the battle in a single statement
+        if not write_db(('UPDATE players SET in_battle = 0, monster = NULL WHERE id = ? AND in_battle = 1 RETURNING id', (pid,))):
+            return jsonify({'ok': False, 'error': 'no active battle'}), 400
+        invalidate_status(pid)
+        return jsonify({'ok': True, 'escaped': True})
+
     player = load_player(pid)
     if not player or not player.get('in_battle'):
         return jsonify({'ok': False, 'error': 'no active battle'}), 400
 
     monster = player['monster']
 
-    if action == 'run':
-        player['in_battle'] = False
-        player['monster'] = None
-        save_player(player)
-        return jsonify({'ok': True, 'escaped': True})
-
     # weapon bonus
     bonus = 0
     if player.get('equipped') == 'rusty_sword':
         bonus = 2
 
-    player_dmg = random.randint(3, 6) + bonus
+    player_dmg = roll_int(3, 6) + bonus
     monster['hp'] -= player_dmg
 
     if monster['hp'] <= 0:
@@ -526,7 +806,6 @@ def fight():
     save_player(player)
     return jsonify({'ok': True, 'damage': player_dmg, 'monster_damage': m_dmg, 'player_health': player['health']})
 
-app.view_functions['fight'] = fight
 
 @app.route("/delete_character", methods=["POST"])
 def delete_character():
@@ -537,21 +816,15 @@ def delete_character():
 
     player_id = data["player_id"]
 
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    # Check player exists
-    cursor.execute("SELECT id FROM players WHERE id = ?", (player_id,))
-    player = cursor.fetchone()
+    # RETURNING tells us whether the player existed without a separate SELECT
+    deleted = write_db(
+        ("DELETE FROM dungeons WHERE player_id = ?", (player_id,)),
+        ("DELETE FROM players WHERE id = ? RETURNING id", (player_id,)),
+    )
 
-    if not player:
-        conn.close()
+    if not deleted:
         return jsonify({"ok": False, "error": "Player not found"}), 404
-
-    # Delete player
-    cursor.execute("DELETE FROM players WHERE id = ?", (player_id,))
-    conn.commit()
-    conn.close()
+    invalidate_status(player_id)
 
     return jsonify({
         "ok": True,
@@ -564,6 +837,9 @@ def serve_ui():
 
 # ---------------------- Main ----------------------
 if __name__ == '__main__':
+    from waitress import serve
+
     with app.app_context():
         init_db()
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    # One waitress thread per pooled connection, so no request thread waits on the pool
+    serve(app, host='0.0.0.0', port=5000, threads=DB_POOL_SIZE)